@@ -1,68 +1,259 @@
+import argparse
 import asyncio
-from playwright.async_api import async_playwright
+import json
 import os
+from playwright.async_api import async_playwright
+
+URL = "http://127.0.0.1:5190/"
+OUTPUT_DIR = "audit_results"
+
+# Audit sequence: rail nav targets, visited in this order on every pass
+AUDITS = [
+    {"name": "Dashboard", "click": "button[title='Dashboard']"},
+    {"name": "Calendar", "click": "button[title='Calendar']"},
+    {"name": "Tasks", "click": "button[title='Tasks']"},
+    {"name": "Notes", "click": "button[title='Notes']"},
+    {"name": "Reflections", "click": "button[title='Reflections']"},
+    {"name": "Chat", "click": "button[title='Chat']"},
+    {"name": "Habits", "click": "button[title='Habits']"},
+    {"name": "Goals", "click": "button[title='Goals']"},
+    {"name": "Projects", "click": "button[title='Projects']"},
+    {"name": "Rewards", "click": "button[title='Rewards']"},
+    {"name": "Reports", "click": "button[title='Reports']"},
+    {"name": "Health", "click": "button[title='Health & Fitness']"},
+    {"name": "People", "click": "button[title='People']"},
+    {"name": "Places", "click": "button[title='Places']"},
+    {"name": "Tags", "click": "button[title='Tags']"},
+    {"name": "Timeline", "click": "button[title='Timeline']"}
+]
+
+# PHASE4_PERFORMANCE_BUDGETS.md §3.1: view switching < 200ms
+VIEW_SWITCH_BUDGET_MS = 200
+
+# A transition is "settled" once the DOM has gone this long without mutating
+SETTLE_QUIET_MS = 300
+SETTLE_TIMEOUT_MS = 10000
+
+# Timestamps the pointerdown on a nav button as the input time, then - once
+# the click that actually switches the view has been dispatched - records
+# when the next frame was painted and when the DOM stopped mutating. All
+# times are performance.now() milliseconds, sharing the event's time origin.
+LATENCY_SCRIPT = """
+(() => {
+  const state = { current: null, pointerDown: null };
+  window.__navLatency = state;
+
+  let lastMutation = 0;
+  new MutationObserver(() => { lastMutation = performance.now(); })
+    .observe(document, { subtree: true, childList: true, attributes: true, characterData: true });
+
+  // Event Timing gives the browser's own input-to-next-paint duration where supported
+  try {
+    new PerformanceObserver((list) => {
+      const m = state.current;
+      if (!m) return;
+      for (const e of list.getEntries()) {
+        if (e.startTime >= m.input - 1) m.eventTiming = Math.max(m.eventTiming || 0, e.duration);
+      }
+    }).observe({ type: 'event', durationThreshold: 16 });
+  } catch (e) { /* not supported */ }
+
+  const navButton = (event) => event.target.closest && event.target.closest('button[title]');
+
+  // Mouse down and up arrive as separate input events, so frames can be
+  // painted in between; only remember when the input started here.
+  window.addEventListener('pointerdown', (event) => {
+    const target = navButton(event);
+    state.pointerDown = target ? { target, time: event.timeStamp } : null;
+  }, true);
+
+  // Nav handlers run on click: probe the paint that follows this dispatch.
+  window.addEventListener('click', (event) => {
+    const target = navButton(event);
+    if (!target) return;
+    const down = state.pointerDown && state.pointerDown.target === target ? state.pointerDown : null;
+    state.pointerDown = null;
+    const m = { view: target.title, input: down ? down.time : event.timeStamp, paint: null,
+                settled: null, eventTiming: null, timedOut: false, done: false };
+    state.current = m;
+    lastMutation = event.timeStamp;
+
+    // rAF runs before the frame is painted; a message posted from it is
+    // handled right after that frame has been presented.
+    requestAnimationFrame(() => {
+      const channel = new MessageChannel();
+      channel.port1.onmessage = () => { m.paint = performance.now(); };
+      channel.port2.postMessage(null);
+    });
+
+    const poll = () => {
+      if (state.current !== m) return;
+      const now = performance.now();
+      if (m.paint !== null && now - lastMutation >= %(quiet)d) {
+        m.settled = Math.max(lastMutation, m.paint);
+        m.done = true;
+      } else if (now - m.input > %(timeout)d) {
+        m.timedOut = true;
+        m.done = true;
+      } else {
+        setTimeout(poll, 16);
+      }
+    };
+    setTimeout(poll, 16);
+  }, true);
+})();
+""" % {"quiet": SETTLE_QUIET_MS, "timeout": SETTLE_TIMEOUT_MS}
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+async def measure_click(page, selector):
+    """Click a nav button and wait for the in-page latency record to settle."""
+    await page.evaluate("() => { window.__navLatency.current = null }")
+    await page.click(selector)
+    handle = await page.wait_for_function(
+        "() => { const m = window.__navLatency.current; return m && m.done ? m : null }",
+        timeout=SETTLE_TIMEOUT_MS + 5000,
+    )
+    m = await handle.json_value()
+    return {
+        "paint_ms": None if m["paint"] is None else m["paint"] - m["input"],
+        "settled_ms": None if m["settled"] is None else m["settled"] - m["input"],
+        "event_timing_ms": m["eventTiming"],
+        "timed_out": m["timedOut"],
+    }
 
-async def audit_modernization():
+
+async def profile_click(page, cdp, selector, path, browser=None):
+    """Click a nav button while recording a CPU profile (cdp) or a Chromium trace (browser)."""
+    if browser:
+        await browser.start_tracing(page=page, path=path, screenshots=True)
+    else:
+        await cdp.send("Profiler.start")
+    try:
+        await measure_click(page, selector)
+    finally:
+        if browser:
+            await browser.stop_tracing()
+        else:
+            result = await cdp.send("Profiler.stop")
+            with open(path, "w") as f:
+                json.dump(result["profile"], f)
+
+
+def summarize(samples):
+    """Per-view p50/p95 for paint and settle latency."""
+    summary = {}
+    for name, runs in samples.items():
+        paint = [r["paint_ms"] for r in runs if r["paint_ms"] is not None]
+        settled = [r["settled_ms"] for r in runs if r["settled_ms"] is not None]
+        event = [r["event_timing_ms"] for r in runs if r["event_timing_ms"] is not None]
+        summary[name] = {
+            "runs": len(runs),
+            "timeouts": sum(1 for r in runs if r["timed_out"]),
+            "cold_paint_ms": runs[0]["paint_ms"] if runs else None,
+            "paint_p50_ms": percentile(paint, 50),
+            "paint_p95_ms": percentile(paint, 95),
+            "settled_p50_ms": percentile(settled, 50),
+            "settled_p95_ms": percentile(settled, 95),
+            "event_timing_p95_ms": percentile(event, 95),
+        }
+    return summary
+
+
+def fmt(ms):
+    return "     -" if ms is None else f"{ms:6.0f}"
+
+
+async def audit_modernization(url=URL, repeat=5, profile=False, trace=False, output_dir=OUTPUT_DIR):
     async with async_playwright() as p:
         # High-res viewport for premium feels
         browser = await p.chromium.launch()
         page = await browser.new_page(viewport={'width': 1600, 'height': 1000})
-        
-        url = "http://127.0.0.1:5190/"
+        await page.add_init_script(LATENCY_SCRIPT)
+
         try:
             print(f"Navigating to {url}")
             await page.goto(url)
             await asyncio.sleep(8) # Initial load wait
-            
-            # Audit sequence
-            audits = [
-                {"name": "Dashboard", "click": "button[title='Dashboard']"},
-                {"name": "Calendar", "click": "button[title='Calendar']"},
-                {"name": "Tasks", "click": "button[title='Tasks']"},
-                {"name": "Notes", "click": "button[title='Notes']"},
-                {"name": "Reflections", "click": "button[title='Reflections']"},
-                {"name": "Chat", "click": "button[title='Chat']"},
-                {"name": "Habits", "click": "button[title='Habits']"},
-                {"name": "Goals", "click": "button[title='Goals']"},
-                {"name": "Projects", "click": "button[title='Projects']"},
-                {"name": "Rewards", "click": "button[title='Rewards']"},
-                {"name": "Reports", "click": "button[title='Reports']"},
-                {"name": "Health", "click": "button[title='Health & Fitness']"},
-                {"name": "People", "click": "button[title='People']"},
-                {"name": "Places", "click": "button[title='Places']"},
-                {"name": "Tags", "click": "button[title='Tags']"},
-                {"name": "Timeline", "click": "button[title='Timeline']"}
-            ]
-            
-            output_dir = "audit_results"
+
             if not os.path.exists(output_dir): os.makedirs(output_dir)
-            
-            for audit in audits:
-                print(f"Auditing: {audit['name']}")
-                btn = await page.query_selector(audit['click'])
-                if btn:
-                    await btn.click()
-                    await asyncio.sleep(4) # Wait for renders/animations
-                    await page.screenshot(path=os.path.join(output_dir, f"{audit['name'].lower()}.png"))
+
+            available = []
+            for audit in AUDITS:
+                if await page.query_selector(audit['click']):
+                    available.append(audit)
                 else:
                     print(f"ERROR: Could not find button for {audit['name']}")
-            
+
+            # Each pass cycles through every view, so every click is a real
+            # view switch. Screenshots are taken once, on the first pass.
+            samples = {audit['name']: [] for audit in available}
+            for run in range(repeat):
+                print(f"Pass {run + 1}/{repeat}")
+                for audit in available:
+                    result = await measure_click(page, audit['click'])
+                    samples[audit['name']].append(result)
+                    if run == 0:
+                        print(f"Auditing: {audit['name']} (paint {fmt(result['paint_ms']).strip()}ms, "
+                              f"settled {fmt(result['settled_ms']).strip()}ms)")
+                        await page.screenshot(path=os.path.join(output_dir, f"{audit['name'].lower()}.png"))
+
+            # Profiling skews timings, so it gets its own pass outside the stats
+            if profile or trace:
+                profile_dir = os.path.join(output_dir, "profiles")
+                os.makedirs(profile_dir, exist_ok=True)
+                cdp = await page.context.new_cdp_session(page)
+                await cdp.send("Profiler.enable")
+                for audit in available:
+                    stem = os.path.join(profile_dir, audit['name'].lower())
+                    if profile:
+                        await profile_click(page, cdp, audit['click'], f"{stem}.cpuprofile")
+                    if trace:
+                        await profile_click(page, cdp, audit['click'], f"{stem}.trace.json", browser=browser)
+                print(f"Profiles saved to: {profile_dir}")
+
             # Special audit: Capture Modal
             print("Auditing: Capture Modal")
             await page.keyboard.press("Escape") # Close any open modal
             await asyncio.sleep(1)
-            capture_btn = await page.query_selector("button[title='Capture']")
-            if capture_btn:
-                await capture_btn.click()
-                await asyncio.sleep(2)
+            if await page.query_selector("button[title='Capture']"):
+                samples["Capture Modal"] = [await measure_click(page, "button[title='Capture']")]
                 await page.screenshot(path=os.path.join(output_dir, "capture_modal.png"))
-            
+
+            summary = summarize(samples)
+            with open(os.path.join(output_dir, "latency.json"), "w") as f:
+                json.dump({"url": url, "repeat": repeat, "budget_ms": VIEW_SWITCH_BUDGET_MS,
+                           "summary": summary, "samples": samples}, f, indent=2)
+
+            print(f"\n{'View':<16}{'paint p50':>10}{'p95':>8}{'settled p50':>13}{'p95':>8}")
+            for name, s in summary.items():
+                over = " ⚠" if (s['paint_p95_ms'] or 0) > VIEW_SWITCH_BUDGET_MS else ""
+                print(f"{name:<16}{fmt(s['paint_p50_ms']):>10}{fmt(s['paint_p95_ms']):>8}"
+                      f"{fmt(s['settled_p50_ms']):>13}{fmt(s['settled_p95_ms']):>8}{over}")
+
             print("Audit complete.")
-            
+
         except Exception as e:
             print(f"Audit failed: {e}")
         finally:
             await browser.close()
 
 if __name__ == "__main__":
-    asyncio.run(audit_modernization())
+    parser = argparse.ArgumentParser(description="Audit desktop views and measure view-switch latency.")
+    parser.add_argument("--url", default=URL)
+    parser.add_argument("--repeat", type=int, default=5, help="Passes over all views (default: 5)")
+    parser.add_argument("--profile", action="store_true", help="Record a CPU profile per transition")
+    parser.add_argument("--trace", action="store_true", help="Record a Chromium trace per transition")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    args = parser.parse_args()
+    asyncio.run(audit_modernization(args.url, args.repeat, args.profile, args.trace, args.output_dir))
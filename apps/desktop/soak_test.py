@@ -0,0 +1,205 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+from playwright.async_api import async_playwright
+
+from audit_modernization import AUDITS, URL
+
+OUTPUT_DIR = "soak_results"
+
+# CDP Performance.getMetrics names -> report keys
+METRICS = {
+    "JSHeapUsedSize": "heap_mb",
+    "Nodes": "dom_nodes",
+    "JSEventListeners": "listeners",
+}
+
+# Default failure thresholds: growth per 100 navigation cycles
+THRESHOLDS = {
+    "heap_mb": 5.0,
+    "dom_nodes": 500,
+    "listeners": 100,
+}
+
+
+def slope(points):
+    """Least-squares slope of (x, y) points; 0 when there's nothing to fit."""
+    if len(points) < 2:
+        return 0.0
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if var_x == 0:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+
+
+def error_message(e):
+    """First line of an exception, short enough for the report."""
+    text = str(e).strip()
+    return text.splitlines()[0][:200] if text else type(e).__name__
+
+
+async def sample(cdp):
+    """Force a full GC, then read heap size, DOM node and listener counts."""
+    await cdp.send("HeapProfiler.collectGarbage")
+    result = await cdp.send("Performance.getMetrics")
+    values = {m["name"]: m["value"] for m in result["metrics"]}
+    snapshot = {key: values.get(name) for name, key in METRICS.items()}
+    if snapshot["heap_mb"] is not None:
+        snapshot["heap_mb"] /= 1024 * 1024
+    return snapshot
+
+
+async def soak_context(browser, worker, url, cycles, sample_every, settle):
+    """Cycle one context through every view, sampling after each view.
+
+    Returns (samples, errors). A failed click or sample is recorded and the
+    soak carries on; if the context itself fails, the samples gathered so
+    far are still returned.
+    """
+    samples = []
+    errors = []
+    context = None
+    try:
+        context = await browser.new_context(viewport={'width': 1600, 'height': 1000})
+        page = await context.new_page()
+        cdp = await context.new_cdp_session(page)
+        await cdp.send("Performance.enable")
+        await cdp.send("HeapProfiler.enable")
+
+        await page.goto(url)
+        await asyncio.sleep(8) # Initial load wait
+
+        views = [a for a in AUDITS if await page.query_selector(a['click'])]
+        missing = [a['name'] for a in AUDITS if a not in views]
+        if missing and worker == 0:
+            print(f"Skipping views without a nav button: {', '.join(missing)}")
+
+        for cycle in range(cycles):
+            for audit in views:
+                try:
+                    await page.click(audit['click'], timeout=5000)
+                    await asyncio.sleep(settle)
+                    if cycle % sample_every == 0 or cycle == cycles - 1:
+                        samples.append({"worker": worker, "cycle": cycle, "view": audit['name'],
+                                        **await sample(cdp)})
+                except Exception as e:
+                    errors.append({"worker": worker, "cycle": cycle, "view": audit['name'],
+                                   "error": error_message(e)})
+            if (cycle + 1) % 50 == 0:
+                print(f"  [context {worker}] {cycle + 1}/{cycles} cycles")
+    except Exception as e:
+        print(f"  [context {worker}] aborted: {str(e)[:80]}")
+        errors.append({"worker": worker, "cycle": None, "view": None,
+                       "error": error_message(e)})
+    finally:
+        if context is not None:
+            try:
+                await context.close()
+            except Exception:
+                pass
+    return samples, errors
+
+
+def analyze(samples, warmup, thresholds):
+    """Per-view growth per 100 cycles (worst context) and threshold violations."""
+    report = {}
+    violations = []
+    views = list(dict.fromkeys(s["view"] for s in samples))
+    workers = sorted({s["worker"] for s in samples})
+
+    for view in views:
+        report[view] = {}
+        for key in METRICS.values():
+            per_worker = []
+            for worker in workers:
+                points = [(s["cycle"], s[key]) for s in samples
+                          if s["view"] == view and s["worker"] == worker
+                          and s["cycle"] >= warmup and s[key] is not None]
+                if points:
+                    per_worker.append(slope(points) * 100)
+            if not per_worker:
+                continue
+            worst = max(per_worker)
+            report[view][key] = {
+                "per_100_cycles": round(worst, 3),
+                "mean_per_100_cycles": round(sum(per_worker) / len(per_worker), 3),
+            }
+            if worst > thresholds[key]:
+                violations.append({"view": view, "metric": key,
+                                   "per_100_cycles": round(worst, 3), "threshold": thresholds[key]})
+    return report, violations
+
+
+async def soak_test(url, cycles, contexts, sample_every, settle, warmup, thresholds, output_dir):
+    async with async_playwright() as p:
+        browser = await p.chromium.launch()
+        try:
+            print(f"Soaking {url}: {cycles} cycles x {contexts} context(s)")
+            results = await asyncio.gather(*(
+                soak_context(browser, worker, url, cycles, sample_every, settle)
+                for worker in range(contexts)
+            ))
+        finally:
+            await browser.close()
+
+    samples = [s for worker_samples, _ in results for s in worker_samples]
+    errors = [e for _, worker_errors in results for e in worker_errors]
+    report, violations = analyze(samples, warmup, thresholds)
+
+    if not os.path.exists(output_dir): os.makedirs(output_dir)
+    with open(os.path.join(output_dir, "soak.json"), "w") as f:
+        json.dump({"url": url, "cycles": cycles, "contexts": contexts, "warmup": warmup,
+                   "thresholds": thresholds, "growth": report, "violations": violations,
+                   "errors": errors, "samples": samples}, f, indent=2)
+
+    print(f"\nGrowth per 100 cycles (worst context, after {warmup} warm-up cycles)")
+    print(f"{'View':<16}{'heap MB':>10}{'nodes':>10}{'listeners':>11}")
+    for view, growth in report.items():
+        cells = [growth.get(key, {}).get("per_100_cycles") for key in METRICS.values()]
+        print(f"{view:<16}" + "".join(
+            f"{'-' if v is None else f'{v:.2f}':>{w}}" for v, w in zip(cells, (10, 10, 11))
+        ))
+
+    for v in violations:
+        print(f"LEAK: {v['view']} {v['metric']} +{v['per_100_cycles']}/100 cycles "
+              f"(threshold {v['threshold']})")
+    if errors:
+        print(f"{len(errors)} failed click(s)/sample(s); see 'errors' in soak.json")
+    print(f"Soak results saved to: {os.path.join(output_dir, 'soak.json')}")
+
+    # A context that never got going produced no samples, so no leak verdict
+    aborted = [e for e in errors if e["cycle"] is None]
+    return violations, aborted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cycle through all views repeatedly and detect memory growth.")
+    parser.add_argument("--url", default=URL)
+    parser.add_argument("--cycles", type=int, default=200, help="Passes over all views (default: 200)")
+    parser.add_argument("--contexts", type=int, default=1, help="Concurrent browser contexts (default: 1)")
+    parser.add_argument("--sample-every", type=int, default=10,
+                        help="Sample metrics every N cycles (default: 10)")
+    parser.add_argument("--settle", type=float, default=0.3,
+                        help="Seconds to wait after each click (default: 0.3)")
+    parser.add_argument("--warmup", type=int, default=10,
+                        help="Cycles excluded from the growth fit (default: 10)")
+    parser.add_argument("--max-heap-mb", type=float, default=THRESHOLDS["heap_mb"],
+                        help="Max JS heap growth in MB per 100 cycles")
+    parser.add_argument("--max-nodes", type=float, default=THRESHOLDS["dom_nodes"],
+                        help="Max DOM node growth per 100 cycles")
+    parser.add_argument("--max-listeners", type=float, default=THRESHOLDS["listeners"],
+                        help="Max event listener growth per 100 cycles")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    args = parser.parse_args()
+    if args.sample_every < 1:
+        parser.error("--sample-every must be at least 1")
+
+    thresholds = {"heap_mb": args.max_heap_mb, "dom_nodes": args.max_nodes, "listeners": args.max_listeners}
+    violations, aborted = asyncio.run(soak_test(args.url, args.cycles, args.contexts, args.sample_every,
+                                       args.settle, args.warmup, thresholds, args.output_dir))
+    sys.exit(1 if violations or aborted else 0)
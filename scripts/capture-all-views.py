@@ -2,15 +2,48 @@
 """
 Comprehensive screenshot capture for InSight 5 visual audit.
 Clicks all navigation elements and tests all theme modes.
+
+Matrix mode skips the settings UI entirely: each theme x viewport pair gets
+its own browser context with the theme preloaded into localStorage by an
+init script (and prefers-color-scheme emulated to match), and every view is
+captured in that context. Contexts run in parallel.
+
+Usage:
+    python capture-all-views.py [--format jpeg --quality 85] [--section-capture element]
+    python capture-all-views.py --matrix [--themes dark,warm] [--viewports 1920x1080,1280x800]
+    python capture-all-views.py --static-dir ../apps/desktop/dist --replay-har runs/desktop.har
 """
 
+import argparse
 import asyncio
-import os
 from playwright.async_api import async_playwright
 
+from capture_network import add_network_arguments, configure_context, resolve_base_url
+from capture_output import ScreenshotWriter, add_output_arguments
+from capture_snapshot import SnapshotStore, add_snapshot_arguments
+
 DESKTOP_URL = "http://127.0.0.1:5174"
 OUTPUT_DIR = "/Users/dg/Desktop/Insight4/Insight5/screenshots/audit"
 
+# Theme preference key and values (apps/desktop/src/ui/theme.ts)
+THEME_STORAGE_KEY = "insight5.ui.theme.v2"
+THEMES = ["light", "dark", "warm", "olive", "oliveOrange", "roseGold"]
+DARK_THEMES = {"dark", "olive", "oliveOrange", "roseGold"}
+
+VIEWPORTS = ["1920x1080", "1440x900", "1280x800"]
+
+# Left rail view buttons (title attributes in App.tsx)
+MATRIX_VIEWS = [
+    "Dashboard", "Calendar", "Tasks", "Notes", "Reflections", "Chat", "Habits",
+    "Goals", "Projects", "Ecosystem", "Trackers", "Rewards", "Workout & Nutrition", "Settings",
+]
+
+# Sidebar section containers, nearest first (see .sbSection/.sbPinnedGroup in App.tsx)
+SECTION_CONTAINER_XPATH = (
+    "xpath=ancestor::div[contains(concat(' ', normalize-space(@class), ' '), ' sbPinnedGroup ')"
+    " or contains(concat(' ', normalize-space(@class), ' '), ' sbSection ')][1]"
+)
+
 async def dismiss_modals(page):
     """Dismiss any modals."""
     try:
@@ -22,32 +55,154 @@ async def dismiss_modals(page):
     except:
         pass
 
-async def capture_with_name(page, name):
-    """Capture screenshot with given name."""
-    path = f"{OUTPUT_DIR}/{name}.png"
-    await page.screenshot(path=path, full_page=True)
+async def capture_with_name(writer, snapshots, page, name, target=None, clip=None):
+    """Capture screenshot with given name (skipped if the view's snapshot is unchanged)."""
+    path = await snapshots.capture(writer, page, name, target=target, clip=clip)
     print(f"  ✓ {name}")
     return path
 
+async def capture_section(writer, snapshots, page, header, name, mode):
+    """Capture a sidebar section as an element, a clip of the sidebar, or the full page."""
+    if mode == "element":
+        container = header.locator(SECTION_CONTAINER_XPATH)
+        if await container.count() > 0:
+            return await capture_with_name(writer, snapshots, page, name, target=container.first)
+    if mode in ("element", "clip"):
+        box = await page.locator("aside.sb").first.bounding_box()
+        if box:
+            return await capture_with_name(writer, snapshots, page, name, clip=box)
+    return await capture_with_name(writer, snapshots, page, name)
+
+def slugify(text):
+    return text.lower().replace(" & ", "-").replace(" ", "-")
+
+def parse_viewport(spec):
+    """'1920x1080' -> {"width": 1920, "height": 1080}"""
+    width, height = spec.lower().split("x")
+    return {"width": int(width), "height": int(height)}
+
+async def capture_matrix_cell(browser, args, base_url, theme, viewport, semaphore, record):
+    """Capture every view for one theme x viewport in its own context.
+
+    Returns the number of views captured, or None if the cell failed.
+    """
+    async with semaphore:
+        label = f"{theme}/{viewport}"
+        context = None
+        captured = 0
+        try:
+            context = await browser.new_context(
+                viewport=parse_viewport(viewport),
+                device_scale_factor=args.device_scale_factor,
+                color_scheme="dark" if theme in DARK_THEMES else "light",
+            )
+            await context.add_init_script(
+                f"try {{ localStorage.setItem({THEME_STORAGE_KEY!r}, {theme!r}) }} catch (e) {{}}"
+            )
+            await configure_context(context, args, record=record)
+            cell_dir = f"{OUTPUT_DIR}/matrix/{theme}/{viewport}"
+            writer = ScreenshotWriter.from_args(cell_dir, args)
+            snapshots = SnapshotStore.from_args(cell_dir, args)
+            try:
+                page = await context.new_page()
+                await page.goto(base_url, wait_until="networkidle", timeout=30000)
+                await asyncio.sleep(1)
+                await dismiss_modals(page)
+
+                for view in MATRIX_VIEWS:
+                    try:
+                        btn = page.locator(f'button[title="{view}"]').first
+                        if await btn.count() == 0:
+                            print(f"  ✗ {label} {view}: not found")
+                            continue
+                        await btn.click(timeout=3000)
+                        await asyncio.sleep(0.5)
+                        await dismiss_modals(page)
+                        await snapshots.capture(writer, page, slugify(view))
+                        captured += 1
+                    except Exception as e:
+                        print(f"  ✗ {label} {view}: {str(e)[:50]}")
+            finally:
+                await writer.close()
+                snapshots.close()
+        except Exception as e:
+            print(f"  ✗ {label}: cell failed after {captured} view(s): {str(e)[:50]}")
+            return None
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+
+        print(f"  ✓ {label}: {captured}/{len(MATRIX_VIEWS)} views")
+        return captured
+
+async def capture_matrix(args, base_url):
+    """Capture every view for every theme x viewport, in parallel contexts."""
+    themes = args.themes.split(",") if args.themes else THEMES
+    viewports = args.viewports.split(",") if args.viewports else VIEWPORTS
+    print(f"=== Matrix: {len(themes)} themes x {len(viewports)} viewports x {len(MATRIX_VIEWS)} views ===")
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            semaphore = asyncio.Semaphore(args.concurrency)
+            # Every cell loads the same app and data, so one recording covers them all
+            cells = [(theme, viewport) for theme in themes for viewport in viewports]
+            counts = await asyncio.gather(*(
+                capture_matrix_cell(browser, args, base_url, theme, viewport, semaphore, record=i == 0)
+                for i, (theme, viewport) in enumerate(cells)
+            ))
+        finally:
+            await browser.close()
+
+    failed = [f"{theme}/{viewport}" for (theme, viewport), count in zip(cells, counts) if count is None]
+    print("\n=== Complete ===")
+    print(f"Captured {sum(count or 0 for count in counts)} screenshots to: {OUTPUT_DIR}/matrix")
+    if failed:
+        print(f"Failed cells (0 captures): {', '.join(failed)}")
+
 async def main():
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    parser = argparse.ArgumentParser(description="Capture every desktop view, theme and sidebar section.")
+    parser.add_argument("--section-capture", choices=("element", "clip", "page"), default="element",
+                        help="Sidebar sections as element crops, a sidebar clip, or full pages (default: element)")
+    parser.add_argument("--matrix", action="store_true",
+                        help="Capture every view for every theme x viewport via injected state")
+    parser.add_argument("--themes", help=f"Comma-separated themes for --matrix (default: {','.join(THEMES)})")
+    parser.add_argument("--viewports", help=f"Comma-separated WxH for --matrix (default: {','.join(VIEWPORTS)})")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Parallel browser contexts for --matrix (default: 4)")
+    add_output_arguments(parser)
+    add_network_arguments(parser)
+    add_snapshot_arguments(parser)
+    args = parser.parse_args()
+
+    base_url = resolve_base_url(args, DESKTOP_URL)
+    if args.matrix:
+        await capture_matrix(args, base_url)
+        return
+
+    writer = ScreenshotWriter.from_args(OUTPUT_DIR, args)
+    snapshots = SnapshotStore.from_args(OUTPUT_DIR, args)
 
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=True)
         context = await browser.new_context(
             viewport={"width": 1920, "height": 1080},
-            device_scale_factor=2
+            device_scale_factor=args.device_scale_factor
         )
+        await configure_context(context, args)
         page = await context.new_page()
 
         print("Loading app...")
-        await page.goto(DESKTOP_URL, wait_until="networkidle", timeout=30000)
+        await page.goto(base_url, wait_until="networkidle", timeout=30000)
         await asyncio.sleep(2)
         await dismiss_modals(page)
 
         # 1. CAPTURE DEFAULT VIEW
         print("\n=== Default View ===")
-        await capture_with_name(page, "00-default-dashboard")
+        await capture_with_name(writer, snapshots, page, "00-default-dashboard")
 
         # 2. LEFT RAIL ICONS (the vertical icon bar on far left)
         print("\n=== Left Rail Navigation ===")
@@ -59,7 +214,7 @@ async def main():
                 await icon.click(timeout=3000)
                 await asyncio.sleep(0.8)
                 await dismiss_modals(page)
-                await capture_with_name(page, f"rail-{i:02d}")
+                await capture_with_name(writer, snapshots, page, f"rail-{i:02d}")
             except Exception as e:
                 print(f"  ✗ rail-{i:02d}: {str(e)[:50]}")
 
@@ -78,7 +233,7 @@ async def main():
                     await btn.click(timeout=5000)
                     await asyncio.sleep(0.8)
                     await dismiss_modals(page)
-                    await capture_with_name(page, name)
+                    await capture_with_name(writer, snapshots, page, name)
             except Exception as e:
                 print(f"  ✗ {name}: {str(e)[:50]}")
 
@@ -106,7 +261,7 @@ async def main():
                             await first_rail.click()
                             await asyncio.sleep(0.5)
 
-                        await capture_with_name(page, f"theme-{theme.lower()}-dashboard")
+                        await capture_with_name(writer, snapshots, page, f"theme-{theme.lower()}-dashboard")
 
                         # Back to settings
                         await settings_btn.click()
@@ -125,7 +280,8 @@ async def main():
                 if await section_header.count() > 0:
                     await section_header.click()
                     await asyncio.sleep(0.5)
-                    await capture_with_name(page, f"section-{section.lower().replace(' ', '-')}")
+                    await capture_section(writer, snapshots, page, section_header,
+                                          f"section-{section.lower().replace(' ', '-')}", args.section_capture)
             except Exception as e:
                 print(f"  ✗ section-{section}: {str(e)[:50]}")
 
@@ -136,7 +292,7 @@ async def main():
             if await fab.count() > 0:
                 await fab.click()
                 await asyncio.sleep(0.8)
-                await capture_with_name(page, "fab-opened")
+                await capture_with_name(writer, snapshots, page, "fab-opened")
         except Exception as e:
             print(f"  ✗ FAB: {str(e)[:50]}")
 
@@ -148,11 +304,14 @@ async def main():
             if await items.count() > 0:
                 await items.first.click()
                 await asyncio.sleep(0.5)
-                await capture_with_name(page, "details-panel-active")
+                await capture_with_name(writer, snapshots, page, "details-panel-active")
         except Exception as e:
             print(f"  ✗ Details panel: {str(e)[:50]}")
 
+        await context.close()  # flushes a recorded HAR
         await browser.close()
+        await writer.close()
+        snapshots.close()
         print("\n=== Complete ===")
         print(f"Screenshots saved to: {OUTPUT_DIR}")
 
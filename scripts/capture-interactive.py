@@ -2,12 +2,20 @@
 """
 Interactive screenshot capture for InSight 5.
 Clicks sidebar navigation items to capture each view.
+
+Usage:
+    python capture-interactive.py [--format webp --quality 80] [--viewport-only]
+    python capture-interactive.py --replay-har runs/desktop.har --block analytics,fonts
 """
 
+import argparse
 import asyncio
-import os
 from playwright.async_api import async_playwright
 
+from capture_network import add_network_arguments, configure_context, resolve_base_url
+from capture_output import ScreenshotWriter, add_output_arguments
+from capture_snapshot import SnapshotStore, add_snapshot_arguments
+
 DESKTOP_URL = "http://127.0.0.1:5174"
 OUTPUT_DIR = "/Users/dg/Desktop/Insight4/Insight5/screenshots/desktop"
 
@@ -40,26 +48,28 @@ async def dismiss_modals(page):
     except:
         pass
 
-async def capture_desktop_interactive():
+async def capture_desktop_interactive(args, base_url=DESKTOP_URL):
     """Capture screenshots by clicking sidebar navigation."""
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    writer = ScreenshotWriter.from_args(OUTPUT_DIR, args)
+    snapshots = SnapshotStore.from_args(OUTPUT_DIR, args)
 
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=False)  # Visible for debugging
         context = await browser.new_context(
             viewport={"width": 1920, "height": 1080},
-            device_scale_factor=2
+            device_scale_factor=args.device_scale_factor
         )
+        await configure_context(context, args)
         page = await context.new_page()
 
         print("Loading app...")
-        await page.goto(DESKTOP_URL, wait_until="networkidle", timeout=30000)
+        await page.goto(base_url, wait_until="networkidle", timeout=30000)
         await asyncio.sleep(2)
         await dismiss_modals(page)
 
         # Capture initial dashboard view
         print("Capturing dashboard (initial view)...")
-        await page.screenshot(path=f"{OUTPUT_DIR}/01-dashboard.png", full_page=True)
+        await snapshots.capture(writer, page, "01-dashboard")
 
         # Try clicking on various navigation elements
         nav_attempts = [
@@ -95,7 +105,7 @@ async def capture_desktop_interactive():
                     await element.click()
                     await asyncio.sleep(1)
                     await dismiss_modals(page)
-                    await page.screenshot(path=f"{OUTPUT_DIR}/{name}.png", full_page=True)
+                    await snapshots.capture(writer, page, name)
                     print(f"  ✓ Captured {name}")
                 else:
                     print(f"  ✗ Not found: {selector}")
@@ -112,11 +122,19 @@ async def capture_desktop_interactive():
         if await sidebar.count() > 0:
             print("\nSidebar structure found")
 
+        await context.close()  # flushes a recorded HAR
         await browser.close()
+        await writer.close()
+        snapshots.close()
         print("\n=== Done ===")
 
 async def main():
-    await capture_desktop_interactive()
+    parser = argparse.ArgumentParser(description="Capture desktop views by clicking sidebar navigation.")
+    add_output_arguments(parser)
+    add_network_arguments(parser)
+    add_snapshot_arguments(parser)
+    args = parser.parse_args()
+    await capture_desktop_interactive(args, resolve_base_url(args, DESKTOP_URL))
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,130 @@
+"""
+Shared network setup for the InSight 5 capture scripts.
+
+Record mode saves every request/response of a run to a HAR file; replay mode
+serves those responses back through Playwright request interception, so a
+capture run needs neither the dev server nor the backend and gets the same
+data and timing every time. Analytics beacons and web fonts can be blocked
+outright, and a built app (apps/desktop/dist) can be served from a local
+static server instead of Vite.
+
+Usage (from a capture script):
+    from capture_network import add_network_arguments, configure_context, resolve_base_url
+
+    add_network_arguments(parser)
+    base_url = resolve_base_url(args, DESKTOP_URL)
+    context = await browser.new_context(...)
+    await configure_context(context, args)
+    ...
+    await context.close()  # flushes a recorded HAR
+"""
+
+import functools
+import os
+import re
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+ANALYTICS_PATTERN = re.compile(
+    r"google-analytics\.com|googletagmanager\.com|doubleclick\.net|segment\.(io|com)"
+    r"|mixpanel\.com|amplitude\.com|posthog\.com|plausible\.io|hotjar\.com|sentry\.io"
+)
+FONT_PATTERN = re.compile(r"fonts\.(googleapis|gstatic)\.com|\.(woff2?|ttf|otf|eot)(\?|$)")
+
+BLOCKABLE = ("analytics", "fonts")
+
+
+def add_network_arguments(parser):
+    """Register the shared network options on an argparse parser."""
+    group = parser.add_argument_group("network")
+    group.add_argument("--url", help="Base URL of the app (overrides the script default)")
+    mode = group.add_mutually_exclusive_group()
+    mode.add_argument("--record-har", metavar="PATH",
+                      help="Record all network traffic of the run to a HAR file")
+    mode.add_argument("--replay-har", metavar="PATH",
+                      help="Serve responses from a recorded HAR instead of the network")
+    group.add_argument("--har-fallback", action="store_true",
+                       help="With --replay-har, let requests missing from the HAR hit the network "
+                            "(default: abort them, fully offline)")
+    group.add_argument("--block", default="",
+                       help=f"Comma-separated request classes to block: {', '.join(BLOCKABLE)}")
+    group.add_argument("--static-dir", metavar="DIR",
+                       help="Serve a static build (e.g. apps/desktop/dist) and capture against it")
+    group.add_argument("--static-port", type=int, default=0,
+                       help="Port for --static-dir (default: any free port)")
+    return group
+
+
+class SpaRequestHandler(SimpleHTTPRequestHandler):
+    """Static file handler that falls back to index.html for client-side routes."""
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if not os.path.exists(path) and "." not in os.path.basename(path):
+            self.path = "/index.html"
+        return super().send_head()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_static_server(directory, port=0):
+    """Serve directory on 127.0.0.1 from a daemon thread; returns the base URL."""
+    handler = functools.partial(SpaRequestHandler, directory=directory)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def resolve_base_url(args, default):
+    """Pick the app URL: a started static server, --url, or the script default."""
+    if args.static_dir:
+        base_url = start_static_server(args.static_dir, args.static_port)
+        print(f"Serving {args.static_dir} at {base_url}")
+        args.static_url = base_url
+        return base_url
+    return args.url or default
+
+
+def should_block(request, blocked):
+    """Whether a request falls into one of the blocked classes."""
+    if "analytics" in blocked and ANALYTICS_PATTERN.search(request.url):
+        return True
+    if "fonts" in blocked and (request.resource_type == "font" or FONT_PATTERN.search(request.url)):
+        return True
+    return False
+
+
+async def configure_context(context, args, record=True):
+    """Apply HAR record/replay and request blocking to a browser context.
+
+    Pass record=False for extra contexts of a parallel run so only one of
+    them writes the HAR file.
+    """
+    if args.record_har and record:
+        os.makedirs(os.path.dirname(os.path.abspath(args.record_har)), exist_ok=True)
+        await context.route_from_har(args.record_har, update=True, update_content="embed")
+    elif args.replay_har:
+        await context.route_from_har(
+            args.replay_har, not_found="fallback" if args.har_fallback else "abort"
+        )
+
+    # The static build is local already; only backend traffic comes from the HAR.
+    static_url = getattr(args, "static_url", None)
+    if args.replay_har and static_url:
+        await context.route(f"{static_url}/**", lambda route: route.continue_())
+
+    blocked = {name.strip() for name in args.block.split(",") if name.strip()}
+    unknown = blocked - set(BLOCKABLE)
+    if unknown:
+        raise ValueError(f"Unknown --block class(es): {', '.join(sorted(unknown))}")
+
+    if blocked:
+        # Registered last, so Playwright consults it before the HAR route.
+        async def block_route(route):
+            if should_block(route.request, blocked):
+                await route.abort("blockedbyclient")
+            else:
+                await route.fallback()
+
+        await context.route("**/*", block_route)
@@ -0,0 +1,246 @@
+"""
+Shared screenshot output for the InSight 5 capture scripts.
+
+Screenshots are grabbed from the browser as raw bytes and handed to a worker
+pool for encoding and writing, so the browser-driving loop never waits on
+PNG/WebP compression or disk I/O. Byte-identical consecutive frames are
+encoded once; the duplicate's own file is a hardlink (or copy) of the
+first, and manifest.json records which frame it duplicates.
+
+Usage (from a capture script):
+    from capture_output import ScreenshotWriter, add_output_arguments
+
+    add_output_arguments(parser)
+    writer = ScreenshotWriter.from_args(OUTPUT_DIR, args)
+    await writer.capture(page, "dashboard")
+    await writer.capture(page.locator(".sbSection").first, "section-pinned")
+    await writer.close()
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+FORMATS = ("png", "jpeg", "webp")
+EXTENSIONS = {"png": "png", "jpeg": "jpg", "webp": "webp"}
+
+
+def encode_and_write(data, path, fmt, quality, optimize):
+    """Worker: re-encode browser PNG bytes if needed and write them to disk."""
+    # Never write through an old hardlink into another view's image
+    if os.path.lexists(path):
+        os.remove(path)
+    if fmt == "webp" or (fmt == "png" and optimize):
+        import io
+        from PIL import Image
+
+        with Image.open(io.BytesIO(data)) as image:
+            if fmt == "webp":
+                image.save(path, "WEBP", quality=quality or 80, method=4)
+            else:
+                image.save(path, "PNG", optimize=True)
+    else:
+        with open(path, "wb") as f:
+            f.write(data)
+    return path
+
+
+def link_or_copy(source, path):
+    """Worker: materialize a duplicate frame under its own name."""
+    if os.path.lexists(path):
+        os.remove(path)
+    try:
+        os.link(source, path)
+    except OSError:
+        shutil.copy2(source, path)
+    return path
+
+
+def notify_when_written(write, callback):
+    """Call callback once a queued write future has completed successfully."""
+    if callback is None:
+        return
+
+    def done(future):
+        if not future.cancelled() and future.exception() is None:
+            callback()
+
+    write.add_done_callback(done)
+
+
+def add_output_arguments(parser):
+    """Register the shared screenshot output options on an argparse parser."""
+    group = parser.add_argument_group("screenshot output")
+    group.add_argument("--format", choices=FORMATS, default="png",
+                       help="Image format (default: png)")
+    group.add_argument("--quality", type=int,
+                       help="JPEG/WebP quality 0-100 (default: browser/Pillow default)")
+    group.add_argument("--scale", choices=("device", "css"), default="device",
+                       help="'css' captures one pixel per CSS pixel regardless of device scale")
+    group.add_argument("--device-scale-factor", type=float, default=2,
+                       help="Browser device scale factor (default: 2, retina)")
+    group.add_argument("--viewport-only", action="store_true",
+                       help="Capture the viewport instead of the full page")
+    group.add_argument("--optimize", action="store_true",
+                       help="Recompress PNGs with Pillow in the worker pool (smaller, slower)")
+    group.add_argument("--no-dedupe", action="store_true",
+                       help="Write every frame even if identical to the previous one")
+    group.add_argument("--workers", type=int,
+                       help="Encoder worker count (default: CPU count)")
+    return group
+
+
+class ScreenshotWriter:
+    """Takes screenshots in the browser loop and encodes/writes them in a pool."""
+
+    def __init__(self, output_dir, fmt="png", quality=None, scale="device",
+                 full_page=True, optimize=False, dedupe=True, workers=None,
+                 device_scale_factor=None):
+        if fmt == "webp" or optimize:
+            try:
+                import PIL  # noqa: F401
+            except ImportError:
+                print("Error: pillow not installed. Run: pip install pillow")
+                sys.exit(1)
+
+        self.output_dir = output_dir
+        self.fmt = fmt
+        self.quality = quality
+        self.scale = scale
+        self.full_page = full_page
+        self.optimize = optimize
+        self.dedupe = dedupe
+        self.device_scale_factor = device_scale_factor
+        self.manifest = {}
+        self._pending = []
+        self._last_digest = None
+        self._last_path = None
+        self._last_name = None
+        self._last_write = None
+
+        # Re-encoding is CPU bound; plain writes only need a thread.
+        needs_encode = fmt == "webp" or (fmt == "png" and optimize)
+        self._pool = ProcessPoolExecutor(workers) if needs_encode else ThreadPoolExecutor(workers)
+        os.makedirs(output_dir, exist_ok=True)
+
+    @classmethod
+    def from_args(cls, output_dir, args):
+        """Build a writer from add_output_arguments() options."""
+        return cls(
+            output_dir,
+            fmt=args.format,
+            quality=args.quality,
+            scale=args.scale,
+            full_page=not args.viewport_only,
+            optimize=args.optimize,
+            dedupe=not args.no_dedupe,
+            workers=args.workers,
+            device_scale_factor=args.device_scale_factor,
+        )
+
+    def path_for(self, name):
+        return os.path.join(self.output_dir, f"{name}.{EXTENSIONS[self.fmt]}")
+
+    def describe(self, target, clip=None):
+        """The settings a capture of target would use, for change detection."""
+        if clip:
+            kind = "clip"
+        elif hasattr(target, "goto"):
+            kind = "page" if self.full_page else "viewport"
+        else:
+            kind = "element"
+        return {
+            "format": self.fmt,
+            "quality": self.quality,
+            "optimize": self.optimize,
+            "scale": self.scale,
+            "device_scale_factor": self.device_scale_factor,
+            "kind": kind,
+            "clip": {k: round(v) for k, v in clip.items()} if clip else None,
+        }
+
+    async def capture(self, target, name, clip=None, on_written=None):
+        """Screenshot a page or locator and queue it for writing; returns the file path.
+
+        Pass a Locator for element-level captures, or a page plus a clip dict
+        ({"x", "y", "width", "height"}) for a fixed region. on_written, if
+        given, is called once the image is on disk (not if the write fails).
+        """
+        # The browser encodes JPEG natively; PNG is the lossless source for WebP.
+        options = {"type": "jpeg" if self.fmt == "jpeg" else "png", "scale": self.scale}
+        if self.fmt == "jpeg" and self.quality is not None:
+            options["quality"] = self.quality
+        if clip:
+            options["clip"] = clip
+        elif hasattr(target, "goto"):
+            options["full_page"] = self.full_page
+
+        data = await target.screenshot(**options)
+
+        digest = hashlib.sha1(data).hexdigest()
+        path = self.path_for(name)
+        if self.dedupe and digest == self._last_digest:
+            write = self._last_write
+            if path != self._last_path:
+                write = asyncio.ensure_future(self._link_after(self._last_write, self._last_path, path))
+                self._pending.append(write)
+            notify_when_written(write, on_written)
+            self.manifest[name] = {"file": os.path.basename(path), "duplicate": True,
+                                   "duplicate_of": self._last_name}
+            return path
+
+        loop = asyncio.get_running_loop()
+        self._last_write = loop.run_in_executor(
+            self._pool, encode_and_write, data, path, self.fmt, self.quality, self.optimize
+        )
+        self._pending.append(self._last_write)
+        notify_when_written(self._last_write, on_written)
+        self._last_digest = digest
+        self._last_path = path
+        self._last_name = name
+        self.manifest[name] = {"file": os.path.basename(path), "duplicate": False}
+        return path
+
+    async def _link_after(self, source_write, source, path):
+        """Link a duplicate once the frame it duplicates has been written."""
+        await source_write
+        await asyncio.get_running_loop().run_in_executor(self._pool, link_or_copy, source, path)
+
+    def keep_existing(self, name):
+        """Record that the screenshot from a previous run is still current."""
+        self._last_digest = None
+        self._last_path = None
+        self._last_name = None
+        self._last_write = None
+        self.manifest[name] = {"file": os.path.basename(self.path_for(name)),
+                               "duplicate": False, "unchanged": True}
+
+    async def close(self):
+        """Wait for queued writes, shut the pool down and update manifest.json.
+
+        Entries from other scripts sharing the output directory are kept;
+        only the views captured in this run are replaced.
+        """
+        await asyncio.gather(*self._pending)
+        self._pending = []
+        self._pool.shutdown()
+
+        manifest_path = os.path.join(self.output_dir, "manifest.json")
+        manifest = {}
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, encoding="utf-8") as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                manifest = {}
+        manifest.update(self.manifest)
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        duplicates = sum(1 for entry in self.manifest.values() if entry["duplicate"])
+        if duplicates:
+            print(f"Skipped {duplicates} duplicate frame(s)")
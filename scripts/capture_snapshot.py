@@ -0,0 +1,274 @@
+"""
+DOM and accessibility-tree snapshots for the InSight 5 capture scripts.
+
+Each capture also saves <name>.snapshot.json next to the screenshot: a
+compact, normalized DOM tree plus Playwright's ARIA snapshot. On the next
+run the new snapshot is diffed structurally against the saved one; when
+nothing changed, the previous screenshot is kept and no new image is taken.
+A per-view change summary is merged into snapshot-summary.json.
+
+Structure alone misses purely visual changes, so the snapshot also keeps a
+style fingerprint: the <html> attributes (data-theme, inline tokens) and a
+digest of every loaded stylesheet's rules. It also records how the
+screenshot was taken (format, scale, device scale factor, viewport, full
+page/element/clip). If either differs from the saved snapshot the view
+counts as changed. A snapshot is only saved once its screenshot has been
+written, so a failed capture is retried on the next run.
+
+Normalization drops everything that changes without the view changing:
+scripts, styles, SVG internals, hidden elements, inline styles and ids,
+and digits in text (clocks, dates, counters) are folded to '#'.
+
+Usage (from a capture script):
+    from capture_snapshot import SnapshotStore, add_snapshot_arguments
+
+    add_snapshot_arguments(parser)
+    snapshots = SnapshotStore.from_args(OUTPUT_DIR, args)
+    path = await snapshots.capture(writer, page, "dashboard")
+    snapshots.close()
+"""
+
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+
+SNAPSHOT_SUFFIX = ".snapshot.json"
+MAX_SAMPLE_LINES = 10
+
+# Serializes an element subtree to [tag, attrs, text, children] lists.
+DOM_SNAPSHOT_SCRIPT = """
+(root) => {
+  const SKIP = new Set(['SCRIPT', 'STYLE', 'NOSCRIPT', 'TEMPLATE', 'LINK', 'META']);
+  const ATTRS = ['role', 'aria-label', 'aria-expanded', 'aria-selected', 'aria-checked',
+                 'title', 'name', 'type', 'placeholder', 'alt', 'disabled'];
+  const norm = (s) => s.replace(/\\s+/g, ' ').trim().replace(/\\d/g, '#').slice(0, 80);
+
+  const walk = (el) => {
+    if (SKIP.has(el.tagName) || el.hidden) return null;
+    const style = getComputedStyle(el);
+    if (style.display === 'none' || style.visibility === 'hidden') return null;
+
+    const attrs = {};
+    for (const name of ATTRS) {
+      const value = el.getAttribute(name);
+      if (value !== null) attrs[name] = norm(value);
+    }
+    if (el.classList.length) attrs.class = [...el.classList].sort().join(' ');
+    if (el.tagName === 'A' && el.getAttribute('href')) attrs.href = el.getAttribute('href').split('?')[0];
+
+    let text = '';
+    const children = [];
+    for (const child of el.childNodes) {
+      if (child.nodeType === Node.TEXT_NODE) text += child.textContent;
+      else if (child.nodeType === Node.ELEMENT_NODE && el.tagName !== 'svg') {
+        const node = walk(child);
+        if (node) children.push(node);
+      }
+    }
+    return [el.tagName.toLowerCase(), attrs, norm(text), children];
+  };
+  return walk(root);
+}
+"""
+
+# Theme/token attributes on <html> plus the rules of every loaded stylesheet.
+STYLE_SNAPSHOT_SCRIPT = """
+(root) => {
+  const doc = root.ownerDocument || document;
+  const html = {};
+  for (const attr of doc.documentElement.attributes) html[attr.name] = attr.value;
+
+  const sheets = [...doc.styleSheets, ...(doc.adoptedStyleSheets || [])].map((sheet) => {
+    let text = null;
+    try {
+      text = [...sheet.cssRules].map((rule) => rule.cssText).join('\\n');
+    } catch (e) {}  // cross-origin sheet: only its href is visible
+    return {href: sheet.href, media: sheet.media ? sheet.media.mediaText : '',
+            disabled: sheet.disabled, text};
+  });
+  return {html, sheets};
+}
+"""
+
+
+def add_snapshot_arguments(parser):
+    """Register the shared snapshot options on an argparse parser."""
+    group = parser.add_argument_group("snapshots")
+    group.add_argument("--no-snapshots", action="store_true",
+                       help="Don't save DOM/accessibility snapshots; always screenshot")
+    group.add_argument("--always-screenshot", action="store_true",
+                       help="Save snapshots but take screenshots even for unchanged views")
+    return group
+
+
+def flatten(node, path=""):
+    """Turn a snapshot tree into one line per element, keyed by its ancestry."""
+    if node is None:
+        return []
+    tag, attrs, text, children = node
+    label = tag
+    if attrs.get("class"):
+        label += "." + ".".join(attrs["class"].split())
+    selector = f"{path} > {label}" if path else label
+    details = " ".join(f'{k}="{v}"' for k, v in sorted(attrs.items()) if k != "class")
+    lines = [f"{selector} [{details}] {text!r}"]
+    for child in children:
+        lines.extend(flatten(child, selector))
+    return lines
+
+
+def normalize_aria(text):
+    """Fold digits in an ARIA snapshot the same way the DOM text is folded."""
+    return re.sub(r"\d", "#", text or "")
+
+
+def line_diff(old_lines, new_lines):
+    """Multiset diff of two line lists: counts plus a few sample lines."""
+    old, new = Counter(old_lines), Counter(new_lines)
+    added = list((new - old).elements())
+    removed = list((old - new).elements())
+    return {
+        "added": len(added),
+        "removed": len(removed),
+        "sample_added": added[:MAX_SAMPLE_LINES],
+        "sample_removed": removed[:MAX_SAMPLE_LINES],
+    }
+
+
+def style_lines(style):
+    """One line per <html> attribute and stylesheet, for diffing fingerprints."""
+    if not style:
+        return []
+    lines = [f"html[{name}]={value!r}" for name, value in sorted(style["html"].items())]
+    for sheet in style["sheets"]:
+        lines.append(f"sheet {sheet['href'] or 'inline'} media={sheet['media']!r} "
+                     f"disabled={sheet['disabled']} {sheet['hash'] or 'cross-origin'}")
+    return lines
+
+
+def digest(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class SnapshotStore:
+    """Saves per-view snapshots and decides whether a screenshot is needed."""
+
+    def __init__(self, output_dir, enabled=True, always_screenshot=False):
+        self.output_dir = output_dir
+        self.enabled = enabled
+        self.always_screenshot = always_screenshot
+        self.summary = {}
+        os.makedirs(output_dir, exist_ok=True)
+
+    @classmethod
+    def from_args(cls, output_dir, args):
+        """Build a store from add_snapshot_arguments() options."""
+        return cls(output_dir, enabled=not args.no_snapshots,
+                   always_screenshot=args.always_screenshot)
+
+    def path_for(self, name):
+        return os.path.join(self.output_dir, f"{name}{SNAPSHOT_SUFFIX}")
+
+    async def take(self, root):
+        """Snapshot a locator's subtree (DOM + ARIA) and the page's styles."""
+        dom = await root.evaluate(DOM_SNAPSHOT_SCRIPT)
+        try:
+            aria = normalize_aria(await root.aria_snapshot())
+        except AttributeError:  # Playwright < 1.49
+            aria = ""
+        raw_style = await root.evaluate(STYLE_SNAPSHOT_SCRIPT)
+        style = {
+            "html": raw_style["html"],
+            "sheets": [
+                {"href": sheet["href"], "media": sheet["media"], "disabled": sheet["disabled"],
+                 "hash": digest(sheet["text"]) if sheet["text"] is not None else None}
+                for sheet in raw_style["sheets"]
+            ],
+        }
+        return {"dom": dom, "aria": aria, "style": style, "dom_hash": digest(dom),
+                "aria_hash": digest(aria), "style_hash": digest(style)}
+
+    def compare(self, name, snapshot):
+        """Compare a fresh snapshot with the saved one and record the summary."""
+        path = self.path_for(name)
+        if not os.path.exists(path):
+            change = {"status": "new"}
+        else:
+            with open(path, encoding="utf-8") as f:
+                previous = json.load(f)
+            if all(previous.get(key) == snapshot[key]
+                   for key in ("dom_hash", "aria_hash", "style_hash", "capture_hash")):
+                change = {"status": "unchanged"}
+            else:
+                change = {
+                    "status": "changed",
+                    "dom": line_diff(flatten(previous["dom"]), flatten(snapshot["dom"])),
+                    "aria": line_diff(previous["aria"].splitlines(), snapshot["aria"].splitlines()),
+                }
+                if previous.get("style_hash") != snapshot["style_hash"]:
+                    change["style"] = line_diff(style_lines(previous.get("style")),
+                                                style_lines(snapshot["style"]))
+                if previous.get("capture_hash") != snapshot["capture_hash"]:
+                    change["capture"] = {"previous": previous.get("capture"), "current": snapshot["capture"]}
+        self.summary[name] = change
+        return change
+
+    def save(self, name, snapshot):
+        with open(self.path_for(name), "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+
+    async def capture(self, writer, page, name, target=None, clip=None):
+        """Snapshot the view, then screenshot it only if its structure changed.
+
+        target is an optional Locator for element-level captures; the
+        snapshot then covers just that element. Returns the image path.
+        """
+        if not self.enabled:
+            return await writer.capture(target or page, name, clip=clip)
+
+        snapshot = await self.take(target or page.locator("body"))
+        options = writer.describe(target or page, clip=clip)
+        options["viewport"] = page.viewport_size
+        snapshot["capture"] = options
+        snapshot["capture_hash"] = digest(options)
+        change = self.compare(name, snapshot)
+
+        existing = writer.path_for(name)
+        if change["status"] == "unchanged" and not self.always_screenshot and os.path.exists(existing):
+            writer.keep_existing(name)
+            self.save(name, snapshot)
+            return existing
+
+        if change["status"] == "changed":
+            details = [f"DOM +{change['dom']['added']}/-{change['dom']['removed']}",
+                       f"a11y +{change['aria']['added']}/-{change['aria']['removed']}"]
+            if "style" in change:
+                details.append(f"styles +{change['style']['added']}/-{change['style']['removed']}")
+            if "capture" in change:
+                details.append("capture options changed")
+            print(f"    {name}: {', '.join(details)}")
+        # Saved only once the image is on disk; a failed capture stays "changed"
+        return await writer.capture(target or page, name, clip=clip,
+                                    on_written=lambda: self.save(name, snapshot))
+
+    def close(self):
+        """Merge this run into snapshot-summary.json and print the per-view counts."""
+        if not self.enabled:
+            return
+        summary_path = os.path.join(self.output_dir, "snapshot-summary.json")
+        summary = {}
+        if os.path.exists(summary_path):
+            try:
+                with open(summary_path, encoding="utf-8") as f:
+                    summary = json.load(f)
+            except (OSError, ValueError):
+                summary = {}
+        summary.update(self.summary)
+        with open(summary_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+        counts = Counter(change["status"] for change in self.summary.values())
+        print(f"Snapshots: {counts['changed']} changed, {counts['new']} new, "
+              f"{counts['unchanged']} unchanged (screenshots reused)")
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Incremental visual diff for InSight 5 capture runs.
+Compares a fresh screenshot run against the previous baseline and keeps only
+the images that actually changed, plus a diff heatmap and a JSON report.
+
+Each pair is checked in three stages, cheapest first:
+    1. byte-identical files are unchanged without decoding anything
+    2. a perceptual block-mean hash - matching hashes are unchanged
+    3. on hash mismatch, a NumPy tile-level pixel diff decides for real
+
+Usage:
+    python visual-diff.py <current_dir> <baseline_dir> [--output DIR]
+    python visual-diff.py screenshots/audit screenshots/baseline --prune --update-baseline
+
+Requirements:
+    pip install numpy pillow
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+try:
+    import numpy as np
+    from PIL import Image, ImageDraw
+except ImportError:
+    print("Error: numpy/pillow not installed. Run: pip install numpy pillow")
+    sys.exit(1)
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+# Full-page retina captures can be very tall; don't let Pillow refuse them.
+Image.MAX_IMAGE_PIXELS = None
+
+
+def list_images(directory):
+    """Return image file names in a directory (non-recursive, sorted)."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        name for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS) and not name.endswith(".diff.png")
+    )
+
+
+def file_digest(path):
+    """SHA-256 of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def block_hash(image, hash_width=256):
+    """Perceptual block-mean hash: a small grayscale thumbnail of the image.
+
+    Unlike a 64-bit dHash this keeps one cell per few pixels, so a changed
+    label or icon still moves its cell while PNG/JPEG encoding noise does not.
+    """
+    width, height = image.size
+    hash_height = max(1, round(height * hash_width / width))
+    small = image.convert("L").resize((hash_width, hash_height), Image.Resampling.BOX)
+    return np.asarray(small, dtype=np.int16)
+
+
+def hash_distance(a, b, tolerance):
+    """Number of hash cells whose mean brightness moved by more than tolerance."""
+    if a.shape != b.shape:
+        return max(a.size, b.size)
+    return int((np.abs(a - b) > tolerance).sum())
+
+
+def pixel_diff(current, baseline):
+    """Per-pixel max channel difference over the overlapping region (uint8, HxW)."""
+    height = min(current.shape[0], baseline.shape[0])
+    width = min(current.shape[1], baseline.shape[1])
+    a = current[:height, :width]
+    b = baseline[:height, :width]
+    # max - min keeps everything in uint8 instead of widening to int16
+    return (np.maximum(a, b) - np.minimum(a, b)).max(axis=2)
+
+
+def tile_changes(diff, tile_size, pixel_threshold, tile_ratio):
+    """Boolean grid of tiles whose share of changed pixels exceeds tile_ratio."""
+    height, width = diff.shape
+    rows = -(-height // tile_size)
+    cols = -(-width // tile_size)
+    changed = np.zeros((rows * tile_size, cols * tile_size), dtype=np.uint32)
+    changed[:height, :width] = diff > pixel_threshold
+    counts = changed.reshape(rows, tile_size, cols, tile_size).sum(axis=(1, 3))
+
+    # Edge tiles are partially outside the image; compare against their real area.
+    tile_h = np.full(rows, tile_size)
+    tile_w = np.full(cols, tile_size)
+    tile_h[-1] = height - (rows - 1) * tile_size
+    tile_w[-1] = width - (cols - 1) * tile_size
+    areas = np.outer(tile_h, tile_w)
+    return counts > areas * tile_ratio
+
+
+def render_heatmap(current, diff, tiles, tile_size, path):
+    """Dimmed grayscale of the new capture with diff intensity in red and changed tiles outlined."""
+    height, width = diff.shape
+    base = np.asarray(Image.fromarray(current[:height, :width]).convert("L"), dtype=np.float32) * 0.35
+    heat = np.clip(diff.astype(np.float32) * 4.0, 0, 255)
+    rgb = np.stack([np.maximum(base, heat), base, base], axis=2).astype(np.uint8)
+
+    image = Image.fromarray(rgb)
+    draw = ImageDraw.Draw(image)
+    for row, col in zip(*np.nonzero(tiles)):
+        x0, y0 = col * tile_size, row * tile_size
+        draw.rectangle(
+            [x0, y0, min(x0 + tile_size, width) - 1, min(y0 + tile_size, height) - 1],
+            outline=(255, 214, 0),
+        )
+    image.save(path, optimize=False, compress_level=1)
+
+
+def compare_pair(name, current_dir, baseline_dir, output_dir, options):
+    """Compare one capture against its baseline and return a report entry."""
+    current_path = os.path.join(current_dir, name)
+    baseline_path = os.path.join(baseline_dir, name)
+    entry = {"name": name}
+
+    if not os.path.exists(baseline_path):
+        entry["status"] = "added"
+        return entry
+
+    if file_digest(current_path) == file_digest(baseline_path):
+        entry["status"] = "unchanged"
+        entry["stage"] = "bytes"
+        return entry
+
+    with Image.open(current_path) as cur_img, Image.open(baseline_path) as base_img:
+        entry["size"] = list(cur_img.size)
+        entry["baseline_size"] = list(base_img.size)
+        same_size = cur_img.size == base_img.size
+        distance = hash_distance(
+            block_hash(cur_img, options["hash_width"]),
+            block_hash(base_img, options["hash_width"]),
+            options["hash_tolerance"],
+        )
+        entry["hash_distance"] = distance
+
+        if same_size and distance == 0:
+            entry["status"] = "unchanged"
+            entry["stage"] = "hash"
+            return entry
+
+        current = np.asarray(cur_img.convert("RGB"))
+        baseline = np.asarray(base_img.convert("RGB"))
+
+    diff = pixel_diff(current, baseline)
+    tiles = tile_changes(diff, options["tile_size"], options["pixel_threshold"], options["tile_ratio"])
+    changed_tiles = int(tiles.sum())
+    entry["stage"] = "pixels"
+    entry["changed_tiles"] = changed_tiles
+    entry["total_tiles"] = int(tiles.size)
+    entry["changed_ratio"] = round(changed_tiles / tiles.size, 4) if tiles.size else 0.0
+
+    if same_size and changed_tiles == 0:
+        entry["status"] = "unchanged"
+        return entry
+
+    entry["status"] = "changed"
+    if changed_tiles:
+        rows, cols = np.nonzero(tiles)
+        size = options["tile_size"]
+        entry["bbox"] = [
+            int(cols.min() * size), int(rows.min() * size),
+            int(min((cols.max() + 1) * size, diff.shape[1])),
+            int(min((rows.max() + 1) * size, diff.shape[0])),
+        ]
+
+    stem = os.path.splitext(name)[0]
+    heatmap_path = os.path.join(output_dir, f"{stem}.diff.png")
+    render_heatmap(current, diff, tiles, options["tile_size"], heatmap_path)
+    entry["heatmap"] = heatmap_path
+    return entry
+
+
+def run_diff(current_dir, baseline_dir, output_dir, options, jobs=None):
+    """Compare every capture in current_dir against baseline_dir."""
+    os.makedirs(output_dir, exist_ok=True)
+    current_names = list_images(current_dir)
+    baseline_names = set(list_images(baseline_dir))
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [
+            pool.submit(compare_pair, name, current_dir, baseline_dir, output_dir, options)
+            for name in current_names
+        ]
+        entries = [f.result() for f in futures]
+
+    for name in sorted(baseline_names - set(current_names)):
+        entries.append({"name": name, "status": "removed"})
+
+    for entry in entries:
+        if entry["status"] in ("changed", "added"):
+            kept = os.path.join(output_dir, entry["name"])
+            shutil.copy2(os.path.join(current_dir, entry["name"]), kept)
+            entry["path"] = kept
+
+    return entries
+
+
+def summarize(entries):
+    """Count report entries by status."""
+    summary = {"total": len(entries), "unchanged": 0, "changed": 0, "added": 0, "removed": 0}
+    for entry in entries:
+        summary[entry["status"]] += 1
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Diff a screenshot run against the previous baseline and keep only changed images."
+    )
+    parser.add_argument("current", help="Directory with the new capture run")
+    parser.add_argument("baseline", help="Directory with the previous baseline")
+    parser.add_argument("--output", "-o", help="Where changed images, heatmaps and report go "
+                        "(default: <current>/../<name>-diff)")
+    parser.add_argument("--hash-width", type=int, default=256,
+                        help="Perceptual hash thumbnail width; larger is more sensitive (default: 256)")
+    parser.add_argument("--hash-tolerance", type=int, default=2,
+                        help="Brightness delta per hash cell treated as noise (default: 2)")
+    parser.add_argument("--tile-size", type=int, default=32,
+                        help="Tile edge in pixels for the pixel diff (default: 32)")
+    parser.add_argument("--pixel-threshold", type=int, default=8,
+                        help="Per-pixel channel delta counted as changed, 0-255 (default: 8)")
+    parser.add_argument("--tile-ratio", type=float, default=0.002,
+                        help="Share of changed pixels that marks a tile changed (default: 0.002)")
+    parser.add_argument("--jobs", "-j", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--prune", action="store_true",
+                        help="Delete unchanged captures from the current run directory")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Copy changed/added captures into the baseline directory "
+                             "and delete removed ones from it")
+    parser.add_argument("--fail-on-change", action="store_true",
+                        help="Exit with status 1 if anything changed, was added or removed")
+
+    args = parser.parse_args()
+
+    current_dir = os.path.normpath(args.current)
+    output_dir = args.output or f"{current_dir}-diff"
+    options = {
+        "hash_width": args.hash_width,
+        "hash_tolerance": args.hash_tolerance,
+        "tile_size": args.tile_size,
+        "pixel_threshold": args.pixel_threshold,
+        "tile_ratio": args.tile_ratio,
+    }
+
+    print(f"Diffing {current_dir} against {args.baseline}...")
+    entries = run_diff(current_dir, args.baseline, output_dir, options, args.jobs)
+    summary = summarize(entries)
+
+    for entry in entries:
+        if entry["status"] == "unchanged":
+            continue
+        detail = ""
+        if "changed_tiles" in entry:
+            detail = f" ({entry['changed_tiles']}/{entry['total_tiles']} tiles)"
+        print(f"  {entry['status']:>9}: {entry['name']}{detail}")
+
+    if args.prune:
+        for entry in entries:
+            if entry["status"] == "unchanged":
+                os.remove(os.path.join(current_dir, entry["name"]))
+
+    if args.update_baseline:
+        os.makedirs(args.baseline, exist_ok=True)
+        for entry in entries:
+            if entry["status"] in ("changed", "added"):
+                shutil.copy2(os.path.join(current_dir, entry["name"]),
+                             os.path.join(args.baseline, entry["name"]))
+            elif entry["status"] == "removed":
+                os.remove(os.path.join(args.baseline, entry["name"]))
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "current": current_dir,
+        "baseline": args.baseline,
+        "options": options,
+        "summary": summary,
+        "images": entries,
+    }
+    report_path = os.path.join(output_dir, "report.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n=== Summary ===")
+    print(f"Unchanged: {summary['unchanged']}, changed: {summary['changed']}, "
+          f"added: {summary['added']}, removed: {summary['removed']}")
+    print(f"Report written to: {report_path}")
+
+    if args.fail_on_change and summary["unchanged"] != summary["total"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Mix Graph
+Builds sparse track/artist co-occurrence and transition matrices from
+extracted tracklists, and answers "played alongside" queries.
+
+Matrices (all scipy.sparse CSR, int32 counts):
+    track_cooc    track x track, mixes where both tracks appear
+    track_next    track -> next track, consecutive plays within a mix
+    artist_cooc   artist x artist, mixes where both artists appear
+
+Inputs are tracklist CSVs (like psychedelic_trance_tracklist.csv) or the
+JSON output of extract_tracklist.py --json. Updates are incremental: mixes
+already in the graph (by video_id) are skipped, and new tracks/artists get
+appended ids so existing rows never move.
+
+Usage:
+    python mix_graph.py build *_tracklist.csv --graph mix_graph
+    python mix_graph.py update new_mixes.json --graph mix_graph
+    python mix_graph.py query "Sideform - Advanced Civilization" --graph mix_graph [--next] [-k 10]
+    python mix_graph.py query --artist "Sideform" --graph mix_graph
+    python mix_graph.py stats --graph mix_graph
+
+Requirements:
+    pip install numpy scipy
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Optional
+
+try:
+    import numpy as np
+    import scipy.sparse as sp
+except ImportError:
+    print("Error: numpy/scipy not installed. Run: pip install numpy scipy")
+    sys.exit(1)
+
+MATRICES = ("track_cooc", "track_next", "artist_cooc")
+
+# Splits collaboration credits: "A & B", "A Ft B", "A feat. B", "A vs B", "A x B",
+# but not inside parentheses ("Alias (A & B)" stays one artist). Bare "and" and
+# commas are left alone; they are too often part of a name.
+ARTIST_SPLIT = re.compile(r"\s+(?:&|x|vs\.?|ft\.?|feat\.?|featuring)\s+(?![^()]*\))", re.IGNORECASE)
+
+
+@dataclass
+class Mix:
+    """One mix: its video id and track (artist, title) pairs in play order."""
+    video_id: str
+    tracks: list
+
+
+@dataclass
+class MixGraph:
+    """Vocabularies plus sparse count matrices, persisted to a directory."""
+    tracks: list = field(default_factory=list)       # normalized track keys, index = id
+    track_labels: list = field(default_factory=list)  # first-seen "Artist - Title"
+    artists: list = field(default_factory=list)      # normalized artist keys
+    artist_labels: list = field(default_factory=list)
+    mixes: list = field(default_factory=list)        # ingested video ids
+    matrices: dict = field(default_factory=dict)
+    window: Optional[int] = None
+
+    def __post_init__(self):
+        self._track_ids = {key: i for i, key in enumerate(self.tracks)}
+        self._artist_ids = {key: i for i, key in enumerate(self.artists)}
+        self._mix_ids = set(self.mixes)
+
+
+def normalize(text: str) -> str:
+    """Case- and whitespace-insensitive key."""
+    return " ".join((text or "").casefold().split())
+
+
+def split_artists(artist: str) -> list:
+    """Individual artist names from a collaboration credit."""
+    return [a.strip() for a in ARTIST_SPLIT.split(artist or "") if a.strip()]
+
+
+def read_csv_mixes(path: str) -> list:
+    """Group tracklist CSV rows (video_id, track_number, timestamp_seconds) into mixes."""
+    rows = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            rows.setdefault(row["video_id"], []).append(row)
+
+    mixes = []
+    for video_id, mix_rows in rows.items():
+        mix_rows.sort(key=lambda r: (int(r["timestamp_seconds"] or 0), int(r["track_number"] or 0)))
+        mixes.append(Mix(video_id, [(r["artist"], r["title"]) for r in mix_rows]))
+    return mixes
+
+
+def read_json_mixes(path: str) -> list:
+    """Mixes from extract_tracklist.py --json output."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    mixes = []
+    for tracklist in data:
+        tracks = sorted(
+            tracklist["tracks"],
+            key=lambda t: (t.get("timestamp_seconds") or 0, t.get("position") or 0),
+        )
+        mixes.append(Mix(tracklist["video_id"], [(t.get("artist"), t["title"]) for t in tracks]))
+    return mixes
+
+
+def read_mixes(paths: list) -> list:
+    mixes = []
+    for path in paths:
+        mixes.extend(read_json_mixes(path) if path.endswith(".json") else read_csv_mixes(path))
+    return mixes
+
+
+def intern(key: str, label: str, ids: dict, keys: list, labels: list) -> int:
+    """Id for key, appending it to the vocabulary if new."""
+    idx = ids.get(key)
+    if idx is None:
+        idx = ids[key] = len(keys)
+        keys.append(key)
+        labels.append(label)
+    return idx
+
+
+def pair_indices(n: int, window: Optional[int]):
+    """Upper-triangle (i, j) index pairs, optionally limited to j - i <= window."""
+    rows, cols = np.triu_indices(n, 1)
+    if window is not None:
+        keep = cols - rows <= window
+        rows, cols = rows[keep], cols[keep]
+    return rows, cols
+
+
+def symmetric_counts(groups: list, size: int, window: Optional[int] = None):
+    """Sparse symmetric co-occurrence counts from groups of ids."""
+    rows, cols = [], []
+    for ids in groups:
+        if len(ids) < 2:
+            continue
+        ids = np.asarray(ids, dtype=np.int32)
+        i, j = pair_indices(len(ids), window)
+        a, b = ids[i], ids[j]
+        distinct = a != b
+        rows.append(a[distinct])
+        cols.append(b[distinct])
+
+    if not rows:
+        return sp.csr_matrix((size, size), dtype=np.int32)
+    r = np.concatenate(rows)
+    c = np.concatenate(cols)
+    data = np.ones(len(r) * 2, dtype=np.int32)
+    matrix = sp.coo_matrix((data, (np.concatenate([r, c]), np.concatenate([c, r]))), shape=(size, size))
+    return matrix.tocsr()  # sums duplicate entries
+
+
+def transition_counts(sequences: list, size: int):
+    """Sparse directed counts of consecutive id pairs."""
+    rows, cols = [], []
+    for ids in sequences:
+        ids = np.asarray(ids, dtype=np.int32)
+        a, b = ids[:-1], ids[1:]
+        distinct = a != b
+        rows.append(a[distinct])
+        cols.append(b[distinct])
+
+    if not rows:
+        return sp.csr_matrix((size, size), dtype=np.int32)
+    r = np.concatenate(rows)
+    data = np.ones(len(r), dtype=np.int32)
+    return sp.coo_matrix((data, (r, np.concatenate(cols))), shape=(size, size)).tocsr()
+
+
+def add_mixes(graph: MixGraph, mixes: list) -> int:
+    """Add mixes not yet in the graph; returns how many were added."""
+    track_sequences, track_sets, artist_sets = [], [], []
+    added = 0
+
+    for mix in mixes:
+        if mix.video_id in graph._mix_ids or not mix.tracks:
+            continue
+        graph._mix_ids.add(mix.video_id)
+        graph.mixes.append(mix.video_id)
+        added += 1
+
+        sequence, artist_ids = [], set()
+        for artist, title in mix.tracks:
+            label = f"{artist} - {title}" if artist else title
+            key = normalize(f"{artist or ''} - {title}")
+            sequence.append(intern(key, label, graph._track_ids, graph.tracks, graph.track_labels))
+            for name in split_artists(artist):
+                artist_ids.add(intern(normalize(name), name, graph._artist_ids,
+                                      graph.artists, graph.artist_labels))
+
+        track_sequences.append(sequence)
+        # Co-occurrence counts each track once per mix, in first-play order
+        track_sets.append(list(dict.fromkeys(sequence)))
+        artist_sets.append(sorted(artist_ids))
+
+    n_tracks, n_artists = len(graph.tracks), len(graph.artists)
+    new = {
+        "track_cooc": symmetric_counts(track_sets, n_tracks, graph.window),
+        "track_next": transition_counts(track_sequences, n_tracks),
+        "artist_cooc": symmetric_counts(artist_sets, n_artists),
+    }
+    for name, delta in new.items():
+        existing = graph.matrices.get(name)
+        if existing is None:
+            graph.matrices[name] = delta
+        else:
+            # Ids are append-only, so growing the old matrix keeps every row in place
+            existing = existing.tocsr(copy=True)
+            existing.resize(delta.shape)
+            graph.matrices[name] = (existing + delta).tocsr()
+    return added
+
+
+def save_graph(graph: MixGraph, directory: str):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "vocab.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "window": graph.window,
+            "mixes": graph.mixes,
+            "tracks": graph.tracks,
+            "track_labels": graph.track_labels,
+            "artists": graph.artists,
+            "artist_labels": graph.artist_labels,
+        }, f, ensure_ascii=False)
+    for name in MATRICES:
+        sp.save_npz(os.path.join(directory, f"{name}.npz"), graph.matrices[name])
+
+
+def load_graph(directory: str) -> MixGraph:
+    with open(os.path.join(directory, "vocab.json"), encoding="utf-8") as f:
+        vocab = json.load(f)
+    matrices = {name: sp.load_npz(os.path.join(directory, f"{name}.npz")).tocsr() for name in MATRICES}
+    return MixGraph(
+        tracks=vocab["tracks"],
+        track_labels=vocab["track_labels"],
+        artists=vocab["artists"],
+        artist_labels=vocab["artist_labels"],
+        mixes=vocab["mixes"],
+        matrices=matrices,
+        window=vocab.get("window"),
+    )
+
+
+def top_k(matrix, row: int, k: int) -> list:
+    """(column, count) pairs for the k largest entries of one CSR row."""
+    start, end = matrix.indptr[row], matrix.indptr[row + 1]
+    cols = matrix.indices[start:end]
+    counts = matrix.data[start:end]
+    if len(counts) > k:
+        keep = np.argpartition(-counts, k - 1)[:k]
+        cols, counts = cols[keep], counts[keep]
+    order = np.lexsort((cols, -counts))
+    return [(int(cols[i]), int(counts[i])) for i in order]
+
+
+def resolve(query: str, keys: list, labels: list, ids: dict) -> Optional[int]:
+    """Exact normalized match first, then the first label containing the query."""
+    needle = normalize(query)
+    if needle in ids:
+        return ids[needle]
+    matches = [i for i, key in enumerate(keys) if needle in key]
+    if len(matches) > 1:
+        print(f"{len(matches)} matches for '{query}', using '{labels[matches[0]]}'. Others:", file=sys.stderr)
+        for i in matches[1:6]:
+            print(f"  {labels[i]}", file=sys.stderr)
+    return matches[0] if matches else None
+
+
+def format_stats(graph: MixGraph) -> str:
+    lines = [f"Mixes: {len(graph.mixes)}", f"Tracks: {len(graph.tracks)}", f"Artists: {len(graph.artists)}"]
+    for name in MATRICES:
+        m = graph.matrices[name]
+        size_kb = (m.data.nbytes + m.indices.nbytes + m.indptr.nbytes) / 1024
+        lines.append(f"{name}: {m.nnz} non-zeros, {int(m.sum())} total count, {size_kb:.0f} KB")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build and query track/artist co-occurrence graphs from extracted tracklists."
+    )
+    parser.add_argument("--graph", "-g", default="mix_graph",
+                        help="Graph directory (default: mix_graph)")
+    # Also accept --graph after the subcommand; SUPPRESS keeps a value given
+    # before the subcommand from being reset to the default.
+    graph_option = argparse.ArgumentParser(add_help=False)
+    graph_option.add_argument("--graph", "-g", default=argparse.SUPPRESS,
+                              help="Graph directory (default: mix_graph)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", parents=[graph_option],
+                                help="Build a new graph from tracklist CSV/JSON files")
+    build.add_argument("inputs", nargs="+")
+    build.add_argument("--window", "-w", type=int,
+                       help="Only count tracks played within N positions of each other "
+                            "(default: whole mix)")
+
+    update = commands.add_parser("update", parents=[graph_option], help="Add new mixes to an existing graph")
+    update.add_argument("inputs", nargs="+")
+
+    query = commands.add_parser("query", parents=[graph_option], help="Top-k tracks/artists played alongside")
+    query.add_argument("track", nargs="?", help="Track as 'Artist - Title' (substring match allowed)")
+    query.add_argument("--artist", "-a", help="Query artist co-occurrence instead")
+    query.add_argument("--next", "-n", action="store_true", help="Most common next tracks instead")
+    query.add_argument("-k", type=int, default=10, help="Number of results (default: 10)")
+    query.add_argument("--json", "-j", action="store_true", help="Output as JSON")
+
+    commands.add_parser("stats", parents=[graph_option], help="Graph size summary")
+
+    args = parser.parse_args()
+
+    if args.command in ("build", "update"):
+        if args.command == "update" and os.path.exists(os.path.join(args.graph, "vocab.json")):
+            graph = load_graph(args.graph)
+        else:
+            graph = MixGraph(window=getattr(args, "window", None))
+        added = add_mixes(graph, read_mixes(args.inputs))
+        save_graph(graph, args.graph)
+        print(f"Added {added} mixes to {args.graph}", file=sys.stderr)
+        print(format_stats(graph))
+        return
+
+    graph = load_graph(args.graph)
+
+    if args.command == "stats":
+        print(format_stats(graph))
+        return
+
+    if args.artist:
+        idx = resolve(args.artist, graph.artists, graph.artist_labels, graph._artist_ids)
+        matrix, labels = graph.matrices["artist_cooc"], graph.artist_labels
+    elif args.track:
+        idx = resolve(args.track, graph.tracks, graph.track_labels, graph._track_ids)
+        matrix, labels = graph.matrices["track_next" if args.next else "track_cooc"], graph.track_labels
+    else:
+        query.print_help()
+        sys.exit(1)
+
+    if idx is None:
+        print(f"Not found: {args.artist or args.track}", file=sys.stderr)
+        sys.exit(1)
+
+    results = [{"name": labels[col], "count": count} for col, count in top_k(matrix, idx, args.k)]
+    if args.json:
+        print(json.dumps({"query": labels[idx], "results": results}, indent=2, ensure_ascii=False))
+    else:
+        relation = "followed by" if args.next and not args.artist else "played alongside"
+        print(f"{labels[idx]} — {relation}:")
+        for i, r in enumerate(results, 1):
+            print(f"{i:3}. ({r['count']}) {r['name']}")
+
+
+if __name__ == "__main__":
+    main()